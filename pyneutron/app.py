@@ -5,12 +5,26 @@ Main GUI application for PyNeutron
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import numpy as np
+import os
+import threading
 import traceback
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
-from .data_loader import load_nexus_file, create_sample_data
-from .fitting import lorentzian, double_lorentzian, gaussian, fit_spectrum
-from .plotting import initialize_plots, update_plots, plot_fit_results
-from .utils import export_results
+from .data_loader import load_nexus_file, create_sample_data, get_errors
+from .fitting import (lorentzian, double_lorentzian, gaussian, fit_spectrum,
+                      lorentzian_jac, double_lorentzian_jac, gaussian_jac,
+                      estimate_lorentzian_p0, share_array, _fit_one, _fit_row,
+                      _model_kernel)
+from .plotting import (initialize_plots, update_plots, plot_fit_results,
+                       show_spectrum_fit)
+from .utils import export_results, fit_results_to_table
+
+# Spawning pool workers re-imports scipy (and numba) and repeats the JIT
+# warm-up in each, which costs more than fitting a few thousand spectra
+# in-process; smaller batches are fitted in the background thread itself
+FIT_ALL_POOL_MIN = 2000
 
 class NeutronAnalysisApp:
     def __init__(self, root):
@@ -31,15 +45,26 @@ class NeutronAnalysisApp:
         self.data = None
         self.current_q_index = 0
         self.fit_results = []
-        
-        # Create sample data if needed (for testing)
-        self.create_sample_data()
-        
+        self.fit_table = None
+        self._fit_all_thread = None
+        self._pending_q = 0
+        self._update_after_id = None
+        self._x_fine = None
+        self._x_fine_source = None
+        self._omega_finite = None
+        self._omega_finite_source = None
+        
+        # Sample data is generated lazily (see use_sample_data/update_plots)
+        # so startup does not pay for it when a real file is loaded
         self.setup_ui()
         
     def create_sample_data(self):
         """Create sample data for testing when no file is loaded"""
         self.data = create_sample_data()
+        
+        # Results for previous data do not apply to the new Q grid
+        self.fit_results = []
+        self.fit_table = None
     
     def setup_ui(self):
         # Main frame
@@ -142,22 +167,23 @@ class NeutronAnalysisApp:
         param_frame.columnconfigure(1, weight=1)
     
     def setup_plots(self, parent):
-        import matplotlib.pyplot as plt
+        from matplotlib.figure import Figure
         from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
         
-        # Create matplotlib figure with 2x2 subplots
-        self.fig = plt.figure(figsize=(12, 8), dpi=100)
+        # Create matplotlib figure with 2x2 subplots; a plain Figure keeps
+        # the embedded plot out of pyplot's global figure manager
+        self.fig = Figure(figsize=(12, 8), dpi=100)
         self.fig.patch.set_facecolor('#f0f0f0')
         
         # Create subplots
-        self.ax1 = plt.subplot(2, 2, 1)  # 2D Map
-        self.ax2 = plt.subplot(2, 2, 2)  # Current spectrum
-        self.ax3 = plt.subplot(2, 2, 3)  # Dispersion
-        self.ax4 = plt.subplot(2, 2, 4)  # Parameters
+        self.ax1 = self.fig.add_subplot(2, 2, 1)  # 2D Map
+        self.ax2 = self.fig.add_subplot(2, 2, 2)  # Current spectrum
+        self.ax3 = self.fig.add_subplot(2, 2, 3)  # Dispersion
+        self.ax4 = self.fig.add_subplot(2, 2, 4)  # Parameters
         
         # Adjust layout
-        plt.subplots_adjust(left=0.1, right=0.95, bottom=0.1, top=0.95, 
-                           wspace=0.25, hspace=0.35)
+        self.fig.subplots_adjust(left=0.1, right=0.95, bottom=0.1, top=0.95, 
+                                 wspace=0.25, hspace=0.35)
         
         # Embed in tkinter
         self.canvas = FigureCanvasTkAgg(self.fig, parent)
@@ -165,7 +191,7 @@ class NeutronAnalysisApp:
         
         # Initialize plots
         initialize_plots(self.ax1, self.ax2, self.ax3, self.ax4, self.font_sizes)
-        self.canvas.draw()
+        self.canvas.draw_idle()
     
     def use_sample_data(self):
         """Use the sample data for testing"""
@@ -196,6 +222,7 @@ class NeutronAnalysisApp:
             
             # Reset fit results
             self.fit_results = []
+            self.fit_table = None
             
             self.update_info()
             self.update_plots()
@@ -222,15 +249,34 @@ class NeutronAnalysisApp:
             self.info_text.insert(1.0, info)
     
     def on_q_change(self, value):
-        if self.data is not None:
-            self.current_q_index = int(float(value))
-            if self.current_q_index >= len(self.data['q']):
-                self.current_q_index = len(self.data['q']) - 1
-            self.update_plots()
+        # Scale events arrive dozens of times per second while dragging;
+        # remember the latest one and redraw at most once per ~16 ms
+        self._pending_q = int(float(value))
+        if self._update_after_id is None:
+            self._update_after_id = self.root.after(16, self._flush_q_update)
+    
+    def _flush_q_update(self):
+        self._update_after_id = None
+        if self.data is None:
+            # Nothing loaded yet; fall back to the sample data, as
+            # update_plots does, so the index below can be clamped to it
+            self.create_sample_data()
+            self.update_info()
+        
+        self.current_q_index = self._pending_q
+        if self.current_q_index >= len(self.data['q']):
+            self.current_q_index = len(self.data['q']) - 1
+        
+        # Blits just the spectrum and Q cursor when the data and fit
+        # results are the ones already drawn; a single fit made since
+        # then changes the fit table and gets ax3/ax4 redrawn
+        self.update_plots()
     
     def update_plots(self):
         if self.data is None:
-            return
+            # Nothing loaded yet; fall back to the sample data
+            self.create_sample_data()
+            self.update_info()
             
         # Get fitting function based on selected model
         model = self.model_var.get()
@@ -244,12 +290,37 @@ class NeutronAnalysisApp:
         # Update plots
         update_plots(self.ax1, self.ax2, self.ax3, self.ax4, 
                     self.data, self.current_q_index, 
-                    self.fit_results, self.font_sizes, self.canvas, self.fig)
+                    self.fit_table, self.font_sizes, self.canvas, self.fig)
         
-        # Update Q label
+        self.update_q_label()
+    
+    def update_q_label(self):
         if self.current_q_index < len(self.data['q']):
             self.q_label.config(text=f"Q = {self.data['q'][self.current_q_index]:.3f} Å⁻¹ (Index: {self.current_q_index})")
     
+    def get_omega_finite(self):
+        """Finite mask of the ω grid, cached until the grid changes"""
+        omega = self.data['omega']
+        if self._omega_finite_source is not omega:
+            self._omega_finite = np.isfinite(omega)
+            self._omega_finite_source = omega
+        return self._omega_finite
+    
+    def get_fine_grid(self):
+        """ω grid for drawing fitted curves: the data grid with midpoints inserted"""
+        omega = self.data['omega']
+        if self._x_fine_source is not omega:
+            x = np.sort(omega[np.isfinite(omega)]).astype(np.float64)
+            if len(x) > 1:
+                x_fine = np.empty(2 * len(x) - 1)
+                x_fine[::2] = x
+                x_fine[1::2] = 0.5 * (x[:-1] + x[1:])
+            else:
+                x_fine = x
+            self._x_fine = x_fine
+            self._x_fine_source = omega
+        return self._x_fine
+    
     def fit_current(self):
         if self.data is None:
             messagebox.showwarning("Warning", "Please load data first")
@@ -262,9 +333,8 @@ class NeutronAnalysisApp:
             y_data = self.data['S_data'][self.current_q_index, :]
             
             # Get errors if available
-            if 'S_errors' in self.data and self.data['S_errors'].shape == self.data['S_data'].shape:
-                y_errors = self.data['S_errors'][self.current_q_index, :]
-            else:
+            y_errors = get_errors(self.data, self.current_q_index)
+            if y_errors is None:
                 y_errors = np.ones_like(y_data) * 0.1
             
             # Get model and initial parameters
@@ -272,6 +342,7 @@ class NeutronAnalysisApp:
             
             if model == "Lorentzian":
                 fit_func = lorentzian
+                jac_func = lorentzian_jac
                 A0 = float(self.amp_entry.get())
                 x00 = float(self.center_entry.get())
                 gamma0 = float(self.width_entry.get())
@@ -281,6 +352,7 @@ class NeutronAnalysisApp:
                 
             elif model == "Double Lorentzian":
                 fit_func = double_lorentzian
+                jac_func = double_lorentzian_jac
                 A0 = float(self.amp_entry.get())
                 x00 = float(self.center_entry.get())
                 gamma0 = float(self.width_entry.get())
@@ -292,6 +364,7 @@ class NeutronAnalysisApp:
                 
             else:  # Gaussian
                 fit_func = gaussian
+                jac_func = gaussian_jac
                 A0 = float(self.amp_entry.get())
                 x00 = float(self.center_entry.get())
                 sigma0 = float(self.width_entry.get())
@@ -300,34 +373,21 @@ class NeutronAnalysisApp:
                 bounds = ([0, -10, 0.1, 0], [np.inf, 10, 5, np.inf])
             
             # Perform fit
-            popt, perr = fit_spectrum(x_data, y_data, y_errors, fit_func, p0, bounds)
+            popt, perr = fit_spectrum(x_data, y_data, y_errors, fit_func, p0, bounds,
+                                      jac=jac_func, x_finite=self.get_omega_finite())
             
             # Update fit results
-            if len(self.fit_results) <= self.current_q_index:
-                self.fit_results.extend([None] * (self.current_q_index - len(self.fit_results) + 1))
+            # Results are kept for every Q index (None where unfitted), so the
+            # list and the FitTable built from it line up with data['q']
+            num_q = len(self.data['q'])
+            if len(self.fit_results) < num_q:
+                self.fit_results.extend([None] * (num_q - len(self.fit_results)))
             self.fit_results[self.current_q_index] = (popt, perr)
-            
-            # Update plot with fit
-            self.ax2.clear()
-            mask = np.isfinite(x_data) & np.isfinite(y_data) & (y_errors > 0)
-            x_fit = x_data[mask]
-            y_fit = y_data[mask]
-            errors_fit = y_errors[mask]
-            
-            self.ax2.errorbar(x_fit, y_fit, yerr=errors_fit, 
-                             fmt='o', markersize=4, alpha=0.7, label='Data',
-                             capsize=2, elinewidth=1)
-            
-            x_fine = np.linspace(x_fit.min(), x_fit.max(), 500)
-            self.ax2.plot(x_fine, fit_func(x_fine, *popt), 
-                         'r-', linewidth=2, label=f'{model} Fit')
-            
-            self.ax2.set_title(f"Fit at Q = {q_val:.3f} Å⁻¹", fontsize=self.font_sizes['title'])
-            self.ax2.set_xlabel("ω (meV)", fontsize=self.font_sizes['label'])
-            self.ax2.set_ylabel("S(ω)", fontsize=self.font_sizes['label'])
-            self.ax2.tick_params(axis='both', labelsize=self.font_sizes['tick'])
-            self.ax2.legend(fontsize=self.font_sizes['legend'])
-            self.ax2.grid(True, alpha=0.3, linestyle='--')
+            self.fit_table = fit_results_to_table(self.fit_results)
+            if (self._fit_all_thread is not None and self._fit_all_thread.is_alive()
+                    and self._fit_all_state['data'] is self.data):
+                # A running batch would otherwise overwrite this fit
+                self._fit_all_state['manual'][self.current_q_index] = (popt, perr)
             
             # Show parameters
             param_text = f"Model: {model}\n"
@@ -336,11 +396,15 @@ class NeutronAnalysisApp:
                 name = param_names[i] if i < len(param_names) else f'Param {i}'
                 param_text += f"{name}: {val:.3f} ± {err:.3f}\n"
             
-            self.ax2.text(0.02, 0.98, param_text, transform=self.ax2.transAxes,
-                         verticalalignment='top', fontsize=self.font_sizes['info'],
-                         bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.8))
+            # Overlay the fit on the spectrum already shown for this Q
+            x_fine = self.get_fine_grid()
+            overlay = (x_fine, _model_kernel(fit_func)(x_fine, *popt), f'{model} Fit',
+                       f"Fit at Q = {q_val:.3f} Å⁻¹", param_text)
+            if not show_spectrum_fit(self.fig, self.canvas, *overlay):
+                # Nothing plotted yet; draw the spectrum first
+                self.update_plots()
+                show_spectrum_fit(self.fig, self.canvas, *overlay)
             
-            self.canvas.draw()
             messagebox.showinfo("Fit Complete", "Current spectrum fitted successfully!")
             
         except Exception as e:
@@ -352,59 +416,130 @@ class NeutronAnalysisApp:
             messagebox.showwarning("Warning", "Please load data first")
             return
         
-        self.fit_results = []
-        successful_fits = 0
+        if self._fit_all_thread is not None and self._fit_all_thread.is_alive():
+            messagebox.showwarning("Warning", "A batch fit is already running")
+            return
         
-        for i in range(len(self.data['q'])):
-            try:
-                # Get spectrum
-                x_data = self.data['omega']
-                y_data = self.data['S_data'][i, :]
-                
-                # Get errors if available
-                if 'S_errors' in self.data and self.data['S_errors'].shape == self.data['S_data'].shape:
-                    y_errors = self.data['S_errors'][i, :]
-                else:
-                    y_errors = np.ones_like(y_data) * 0.1
-                
-                # Use Lorentzian model for batch fitting
-                A0 = np.max(y_data)
-                C0 = np.min(y_data)
-                
-                # Try to estimate initial center from data
-                mask = np.isfinite(x_data) & np.isfinite(y_data) & (y_errors > 0)
-                x_fit = x_data[mask]
-                y_fit = y_data[mask]
-                
-                if len(x_fit) < 4:
-                    self.fit_results.append(None)
-                    continue
-                
-                center_idx = np.argmax(y_fit)
-                x00 = x_fit[center_idx] if center_idx < len(x_fit) else 0
-                gamma0 = 1.0
-                
-                p0 = [A0, x00, gamma0, C0]
-                bounds = ([0, -10, 0.1, 0], [np.inf, 10, 5, np.inf])
-                
-                popt, pcov = fit_spectrum(x_data, y_data, y_errors, lorentzian, p0, bounds)
-                perr = np.sqrt(np.diag(pcov)) if pcov is not None else np.zeros_like(popt)
-                self.fit_results.append((popt, perr))
-                successful_fits += 1
-                
-            except Exception as e:
-                print(f"Fit failed for Q index {i}: {e}")
-                self.fit_results.append(None)
+        # omega and the error layout are shared by every Q row, so mask and
+        # slice the 2D arrays once instead of per spectrum
+        omega = self.data['omega']
+        S = self.data['S_data']
+        E = get_errors(self.data)
+        if E is None:
+            E = np.full_like(S, 0.1)
+        
+        mask = np.isfinite(omega)
+        x_fit = omega[mask]
+        S_fit = S[:, mask]
+        E_fit = E[:, mask]
+        
+        # Use Lorentzian model for batch fitting, with initial guesses
+        # (including a FWHM width estimate) computed for all Q rows at once
+        bounds = ([0, -10, 0.1, 0], [np.inf, 10, 5, np.inf])
+        p0_arr = estimate_lorentzian_p0(x_fit, S_fit)
+        p0_arr[:, 2] = np.clip(p0_arr[:, 2], bounds[0][2], bounds[1][2])
+        
+        # Rows with too few usable points are skipped
+        n_good = np.count_nonzero(np.isfinite(S_fit) & (E_fit > 0), axis=1)
+        rows = np.flatnonzero(n_good >= 4)
+        
+        if len(rows) >= FIT_ALL_POOL_MIN and (os.cpu_count() or 1) > 1:
+            # Put the spectra in shared memory so each task only carries a row
+            # index; workers view the rows in place instead of unpickling copies
+            shared = [share_array(S_fit), share_array(E_fit)]
+            s_spec, e_spec = shared[0][1], shared[1][1]
+            tasks = [(i, x_fit, s_spec, e_spec, p0_arr[i], bounds) for i in rows]
+        else:
+            shared = []
+            tasks = [(i, x_fit, S_fit[i], E_fit[i], p0_arr[i], bounds) for i in rows]
+        
+        # Fit from a background thread so the Tk mainloop stays responsive.
+        # Results also go straight into a dense FitTable (the Lorentzian has
+        # 4 parameters) so nothing is re-parsed at the end; single fits made
+        # meanwhile are kept in 'manual' and win over the batch
+        self._fit_all_state = {
+            'data': self.data,
+            'results': [None] * len(self.data['q']),
+            'table': fit_results_to_table([None] * len(self.data['q']), n_params=4),
+            'done': 0,
+            'total': len(tasks),
+            'error': None,
+            'manual': {},
+        }
+        self._fit_all_thread = threading.Thread(target=self._run_fit_all,
+                                                args=(tasks, shared, self._fit_all_state),
+                                                daemon=True)
+        self._fit_all_thread.start()
+        self.root.after(100, self._poll_fit_all)
+    
+    def _run_fit_all(self, tasks, shared, state):
+        """Fit all tasks, in a process pool when shared (runs in a worker thread)"""
+        try:
+            if shared:
+                # spawn avoids forking a process that is running Tk and threads
+                ctx = multiprocessing.get_context('spawn')
+                pool = ProcessPoolExecutor(mp_context=ctx)
+                fits = pool.map(_fit_one, tasks, chunksize=4)
+            else:
+                pool = contextlib.nullcontext()
+                fits = map(_fit_row, tasks)
+            
+            with pool:
+                table = state['table']
+                for i, popt, perr in fits:
+                    if popt is not None:
+                        state['results'][i] = (popt, perr)
+                        table.popt[i] = popt
+                        table.perr[i] = perr
+                        table.valid[i] = True
+                    state['done'] += 1
+        except Exception as e:
+            state['error'] = e
+            traceback.print_exc()
+        finally:
+            # The pool has shut down, so no worker still maps the segments
+            for shm, _ in shared:
+                shm.close()
+                shm.unlink()
+    
+    def _poll_fit_all(self):
+        """Report batch-fit progress and finish up once the worker is done"""
+        state = self._fit_all_state
+        if self._fit_all_thread.is_alive():
+            self.info_text.delete(1.0, tk.END)
+            self.info_text.insert(1.0, f"Fitting spectra: {state['done']}/{state['total']}")
+            self.root.after(100, self._poll_fit_all)
+            return
+        
+        if state['data'] is not self.data:
+            # Data was replaced while fitting; these results no longer apply
+            self.update_info()
+            return
+        
+        if state['error'] is not None:
+            self.update_info()
+            messagebox.showerror("Fit Error", f"Batch fit failed: {str(state['error'])}")
+            return
+        
+        self.fit_results = state['results']
+        self.fit_table = state['table']
+        if state['manual']:
+            # Keep single fits made while the batch ran
+            for i, result in state['manual'].items():
+                self.fit_results[i] = result
+            self.fit_table = fit_results_to_table(self.fit_results)
+        successful_fits = len([r for r in self.fit_results if r is not None])
         
         # Update plots with fit results
+        self.update_info()
         self.update_plots()
         
         messagebox.showinfo("Fit Complete", 
                           f"Fitted {successful_fits}/{len(self.data['q'])} spectra")
     
     def plot_fit_results(self):
-        if len(self.fit_results) > 0:
-            plot_fit_results(self.ax3, self.ax4, self.data, self.fit_results, self.font_sizes, self.canvas)
+        if self.fit_table is not None:
+            plot_fit_results(self.ax3, self.ax4, self.data, self.fit_table, self.font_sizes, self.canvas)
     
     def export_results(self):
         if self.data is None or len(self.fit_results) == 0:
@@ -419,7 +554,7 @@ class NeutronAnalysisApp:
         
         if filename:
             try:
-                export_results(filename, self.data, self.fit_results)
+                export_results(filename, self.data, self.fit_table)
                 messagebox.showinfo("Success", f"Results exported to {filename}")
             except Exception as e:
                 messagebox.showerror("Error", f"Export failed: {str(e)}")
@@ -9,17 +9,17 @@ import numpy as np
 q = np.linspace(0.1, 3.0, 50)
 omega = np.linspace(-5, 5, 200)
 
-# Create synthetic S(Q,ω) data
-S_data = np.zeros((len(q), len(omega)))
-for i, q_val in enumerate(q):
-    omega0 = 2.0 * q_val
-    gamma = 0.5 + 0.1 * q_val
-    
-    lorentzian = 5.0 * (gamma/2)**2 / ((omega - omega0)**2 + (gamma/2)**2)
-    lorentzian += 0.5 * (0.6/2)**2 / ((omega + omega0)**2 + (0.6/2)**2)
-    
-    background = 0.1 * np.exp(-omega**2/10)
-    S_data[i, :] = lorentzian + background + 0.05 * np.random.randn(len(omega))
+# Create synthetic S(Q,ω) data, broadcasting Q down the rows
+q_col = q[:, None]
+omega0 = 2.0 * q_col
+gamma = 0.5 + 0.1 * q_col
+
+lorentzian = 5.0 * (gamma/2)**2 / ((omega - omega0)**2 + (gamma/2)**2)
+lorentzian += 0.5 * (0.6/2)**2 / ((omega + omega0)**2 + (0.6/2)**2)
+
+background = 0.1 * np.exp(-omega**2/10)
+rng = np.random.default_rng()
+S_data = lorentzian + background + 0.05 * rng.standard_normal((len(q), len(omega)))
 
 S_data = np.abs(S_data)
 S_errors = 0.1 * np.sqrt(S_data + 0.01)
@@ -1,14 +1,35 @@
 """
 Data loading utilities for NeXus/HDF5 files
+
+Loaders return S_data (and S_errors, when present) as C-contiguous arrays
+of shape (len(q), len(omega)), so each spectrum is one contiguous row.
 """
 
 import h5py
 import numpy as np
 
+def _read_dataset(handle, dtype=np.float32):
+    """
+    Read an HDF5 dataset straight into a preallocated array
+    
+    A single read_direct call converts to dtype during the read, with no
+    intermediate copy; HDF5 reads (and decompresses) each chunk once.
+    """
+    out = np.empty(handle.shape, dtype=dtype)
+    if out.size:
+        handle.read_direct(out)
+    return out
+
 def load_nexus_file(filename):
     """
     Load data from NeXus/HDF5 file
     
+    Only the selected q, omega, S and error datasets are read, each exactly
+    once. All arrays are returned as float32, which is ample for plotting
+    and halves the memory traffic; fitting works in float64 internally.
+    If the file has no error dataset, 'S_errors' is left out of the
+    returned dictionary and errors are estimated on demand by get_errors.
+    
     Parameters:
     -----------
     filename : str
@@ -19,113 +40,163 @@ def load_nexus_file(filename):
     dict
         Dictionary containing data arrays
     """
-    with h5py.File(filename, 'r') as f:
+    # A larger chunk cache avoids re-decompressing chunks on partial reads
+    with h5py.File(filename, 'r', rdcc_nbytes=64*1024*1024) as f:
         # Common NeXus/MANTID naming patterns
         possible_q_names = ['q', 'Q', 'momentum', 'momentum_transfer', 'x', 'qx']
         possible_omega_names = ['omega', 'energy', 'Energy', 'E', 'y', 'energy_transfer']
         possible_data_names = ['S_data', 'data', 'intensity', 'counts', 'signal', 'z']
         possible_error_names = ['errors', 'S_errors', 'error', 'variance', 'sigma']
         
-        # Search through the file structure
-        def find_dataset(f, possible_names, default=None):
+        # Look in the root and 'entry' groups first, as NeXus files are laid
+        # out; group.get follows hard and soft links, so linked NXdata
+        # members are found. Only handles are collected, never data
+        groups = [f]
+        if isinstance(f.get('entry'), h5py.Group):
+            groups.append(f['entry'])
+        
+        def find_in_group(group, possible_names):
             for name in possible_names:
-                if name in f:
-                    return f[name][:]
-            # Try recursive search
-            for key in f.keys():
-                if isinstance(f[key], h5py.Dataset):
-                    for possible in possible_names:
-                        if possible.lower() in key.lower():
-                            return f[key][:]
-            return default
-        
-        # Try to load data
-        q_data = find_dataset(f, possible_q_names)
-        omega_data = find_dataset(f, possible_omega_names)
-        s_data = find_dataset(f, possible_data_names)
-        
-        if q_data is None or omega_data is None or s_data is None:
-            # Try to find data in entry structure
-            if 'entry' in f:
-                entry = f['entry']
-                q_data = find_dataset(entry, possible_q_names)
-                omega_data = find_dataset(entry, possible_omega_names)
-                s_data = find_dataset(entry, possible_data_names)
-        
-        if q_data is None or omega_data is None or s_data is None:
+                handle = group.get(name)
+                if isinstance(handle, h5py.Dataset):
+                    return handle
+            # Fall back to partial name matches among the group's members
+            for key in group:
+                for possible in possible_names:
+                    if possible.lower() in key.lower():
+                        handle = group.get(key)
+                        if isinstance(handle, h5py.Dataset):
+                            return handle
+            return None
+        
+        # For deeper layouts, index every link in the file by lower-cased
+        # basename in a single traversal (built only if needed), keeping the
+        # shallowest dataset for each name
+        datasets = {}
+        
+        def _visit(name):
+            handle = f.get(name)
+            if isinstance(handle, h5py.Dataset):
+                key = name.rsplit('/', 1)[-1].lower()
+                depth = name.count('/')
+                if key not in datasets or depth < datasets[key][0]:
+                    datasets[key] = (depth, handle)
+        
+        def find_dataset(possible_names):
+            for group in groups:
+                handle = find_in_group(group, possible_names)
+                if handle is not None:
+                    return handle
+            if not datasets:
+                f.visit_links(_visit)
+            # Exact names only; partial matches this deep are too loose
+            for name in possible_names:
+                if name.lower() in datasets:
+                    return datasets[name.lower()][1]
+            return None
+        
+        # Try to locate data
+        q_handle = find_dataset(possible_q_names)
+        omega_handle = find_dataset(possible_omega_names)
+        s_handle = find_dataset(possible_data_names)
+        
+        if q_handle is None or omega_handle is None or s_handle is None:
             raise ValueError("Could not find required datasets in file")
         
         # Try to find errors
-        errors_data = find_dataset(f, possible_error_names, None)
-        if errors_data is None and 'entry' in f:
-            errors_data = find_dataset(f['entry'], possible_error_names, None)
-        
-        # Ensure data has correct shape
-        if len(s_data.shape) == 2:
-            # Check if dimensions match
-            if s_data.shape[0] != len(q_data):
-                # Transpose if necessary
-                s_data = s_data.T
-                if errors_data is not None and errors_data.shape == s_data.shape:
-                    errors_data = errors_data.T
-        
-        # Create data dictionary
+        errors_handle = find_dataset(possible_error_names)
+        
+        # Validate dimensions and orientation from the shapes alone
+        if len(s_handle.shape) != 2:
+            raise ValueError(f"Expected 2D data, got shape {s_handle.shape}")
+        
+        num_q = int(np.prod(q_handle.shape))
+        if s_handle.shape[0] == num_q:
+            transpose = False
+        elif s_handle.shape[1] == num_q:
+            transpose = True
+        else:
+            raise ValueError(f"Data shape mismatch: S_data.shape={s_handle.shape}, q length={num_q}")
+        
+        if errors_handle is not None and errors_handle.shape != s_handle.shape:
+            errors_handle = None
+        
+        # Read the selected datasets, once each, and ensure q/omega are 1D
         data = {
-            'q': q_data.flatten() if len(q_data.shape) > 1 else q_data,
-            'omega': omega_data.flatten() if len(omega_data.shape) > 1 else omega_data,
-            'S_data': s_data,
-            'S_errors': errors_data if errors_data is not None else np.ones_like(s_data) * np.sqrt(np.abs(s_data) + 0.01),
+            'q': np.asarray(q_handle, dtype=np.float32).ravel(),
+            'omega': np.asarray(omega_handle, dtype=np.float32).ravel(),
+            'S_data': _read_dataset(s_handle),
             'filename': filename
         }
+        if errors_handle is not None:
+            data['S_errors'] = _read_dataset(errors_handle)
         
-        # Ensure arrays are 1D
-        if len(data['q'].shape) > 1:
-            data['q'] = data['q'].flatten()
-        if len(data['omega'].shape) > 1:
-            data['omega'] = data['omega'].flatten()
-        
-        # Validate dimensions
-        if len(data['S_data'].shape) != 2:
-            raise ValueError(f"Expected 2D data, got shape {data['S_data'].shape}")
-        
-        if data['S_data'].shape[0] != len(data['q']):
-            # Try to fix shape mismatch
-            if data['S_data'].shape[1] == len(data['q']):
-                data['S_data'] = data['S_data'].T
-                data['S_errors'] = data['S_errors'].T
-            else:
-                raise ValueError(f"Data shape mismatch: S_data.shape={data['S_data'].shape}, q length={len(data['q'])}")
+        # Copy transposed data into row-major order rather than keeping a
+        # strided view, so per-Q rows are contiguous
+        if transpose:
+            data['S_data'] = np.ascontiguousarray(data['S_data'].T)
+            if 'S_errors' in data:
+                data['S_errors'] = np.ascontiguousarray(data['S_errors'].T)
         
         return data
 
-def create_sample_data():
+def get_errors(data, index=None):
+    """
+    Get S(Q,ω) errors for the whole map or for a single Q row
+    
+    Data loaded from files without an error dataset has no 'S_errors'
+    entry; its errors are estimated as sqrt(|S| + 0.01), only for the rows
+    that are asked for.
+    
+    Parameters:
+    -----------
+    data : dict
+        Data dictionary
+    index : int, optional
+        Q index of the row to return; the full 2D array if None
+        
+    Returns:
+    --------
+    array or None
+        Error values, or None if the stored errors do not match S_data
+    """
+    if 'S_errors' not in data:
+        s_data = data['S_data'] if index is None else data['S_data'][index]
+        return np.sqrt(np.abs(s_data) + 0.01)
+    
+    if data['S_errors'].shape != data['S_data'].shape:
+        return None
+    
+    return data['S_errors'] if index is None else data['S_errors'][index]
+
+def create_sample_data(seed=None):
     """Create sample data for testing"""
     q = np.linspace(0.1, 3.0, 50)
     omega = np.linspace(-5, 5, 200)
+    rng = np.random.default_rng(seed)
+    
+    # Create synthetic S(Q,ω) data with dispersion relation, broadcasting
+    # Q down the rows and ω across the columns
+    q_col = q[:, None]
+    omega0 = 2.0 * q_col  # Linear dispersion ω = c * q
+    gamma = 0.5 + 0.1 * q_col  # Width increases with Q
+    
+    # Create Lorentzian peaks
+    lorentzian = 5.0 * (gamma/2)**2 / ((omega - omega0)**2 + (gamma/2)**2)
+    lorentzian += 0.5 * (0.6/2)**2 / ((omega + omega0)**2 + (0.6/2)**2)  # Anti-Stokes
     
-    # Create synthetic S(Q,ω) data with dispersion relation
-    S_data = np.zeros((len(q), len(omega)))
-    for i, q_val in enumerate(q):
-        # Dispersion relation: ω = c * q
-        omega0 = 2.0 * q_val  # Linear dispersion
-        gamma = 0.5 + 0.1 * q_val  # Width increases with Q
-        
-        # Create Lorentzian peaks
-        lorentzian = 5.0 * (gamma/2)**2 / ((omega - omega0)**2 + (gamma/2)**2)
-        lorentzian += 0.5 * (0.6/2)**2 / ((omega + omega0)**2 + (0.6/2)**2)  # Anti-Stokes
-        
-        # Add background and noise
-        background = 0.1 * np.exp(-omega**2/10)
-        S_data[i, :] = lorentzian + background + 0.05 * np.random.randn(len(omega))
+    # Add background and noise
+    background = 0.1 * np.exp(-omega**2/10)
+    S_data = lorentzian + background + 0.05 * rng.standard_normal((len(q), len(omega)))
     
     # Ensure no negative values
-    S_data = np.abs(S_data)
+    S_data = np.abs(S_data).astype(np.float32)
     S_errors = 0.1 * np.sqrt(S_data + 0.01)  # Simulated errors
     
     return {
-        'q': q,
-        'omega': omega,
+        'q': q.astype(np.float32),
+        'omega': omega.astype(np.float32),
         'S_data': S_data,
         'S_errors': S_errors,
         'filename': 'Sample Data'
-    }
\ No newline at end of file
+    }
@@ -1,25 +1,203 @@
 """
 Fitting functions and utilities for neutron data analysis
+
+The model functions and their Jacobians are NumPy functions that broadcast
+over any array-like x. When numba is installed, fits use JIT-compiled fused
+loops of the same models instead.
 """
 
 import numpy as np
-from scipy.optimize import curve_fit
+from multiprocessing import shared_memory
+from scipy.optimize import least_squares
+
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
 
 def lorentzian(x, A, x0, gamma, C):
     """Single Lorentzian function"""
+    x = np.asarray(x)
     return A * (gamma/2)**2 / ((x - x0)**2 + (gamma/2)**2) + C
 
 def double_lorentzian(x, A1, x01, gamma1, A2, x02, gamma2, C):
     """Double Lorentzian function"""
+    x = np.asarray(x)
     lorentz1 = A1 * (gamma1/2)**2 / ((x - x01)**2 + (gamma1/2)**2)
     lorentz2 = A2 * (gamma2/2)**2 / ((x - x02)**2 + (gamma2/2)**2)
     return lorentz1 + lorentz2 + C
 
 def gaussian(x, A, x0, sigma, C):
     """Gaussian function"""
+    x = np.asarray(x)
     return A * np.exp(-(x - x0)**2 / (2 * sigma**2)) + C
 
-def fit_spectrum(x_data, y_data, y_errors, func, p0, bounds, maxfev=5000):
+def lorentzian_jac(x, A, x0, gamma, C):
+    """Analytic Jacobian of the single Lorentzian, shape (N, 4)"""
+    x = np.asarray(x)
+    h2 = (gamma/2)**2
+    d = x - x0
+    den = d**2 + h2
+    jac = np.empty((len(x), 4))
+    jac[:, 0] = h2 / den
+    jac[:, 1] = A * h2 * 2 * d / den**2
+    jac[:, 2] = A * (gamma/2) * d**2 / den**2
+    jac[:, 3] = 1.0
+    return jac
+
+def double_lorentzian_jac(x, A1, x01, gamma1, A2, x02, gamma2, C):
+    """Analytic Jacobian of the double Lorentzian, shape (N, 7)"""
+    x = np.asarray(x)
+    jac = np.empty((len(x), 7))
+    jac[:, 0:3] = lorentzian_jac(x, A1, x01, gamma1, 0.0)[:, :3]
+    jac[:, 3:6] = lorentzian_jac(x, A2, x02, gamma2, 0.0)[:, :3]
+    jac[:, 6] = 1.0
+    return jac
+
+def gaussian_jac(x, A, x0, sigma, C):
+    """Analytic Jacobian of the Gaussian, shape (N, 4)"""
+    x = np.asarray(x)
+    d = x - x0
+    g = np.exp(-d**2 / (2 * sigma**2))
+    jac = np.empty((len(x), 4))
+    jac[:, 0] = g
+    jac[:, 1] = A * g * d / sigma**2
+    jac[:, 2] = A * g * d**2 / sigma**3
+    jac[:, 3] = 1.0
+    return jac
+
+if HAS_NUMBA:
+    # Compiled loops behind the models above, for 1-D float64 grids only;
+    # fit_spectrum swaps them in for the public functions
+    @njit(cache=True, fastmath=True)
+    def _lorentzian_kernel(x, A, x0, gamma, C):
+        """Single Lorentzian function"""
+        out = np.empty(x.size)
+        h2 = (0.5 * gamma)**2
+        for i in range(x.size):
+            d = x[i] - x0
+            out[i] = A * h2 / (d * d + h2) + C
+        return out
+
+    @njit(cache=True, fastmath=True)
+    def _double_lorentzian_kernel(x, A1, x01, gamma1, A2, x02, gamma2, C):
+        """Double Lorentzian function"""
+        out = np.empty(x.size)
+        h12 = (0.5 * gamma1)**2
+        h22 = (0.5 * gamma2)**2
+        for i in range(x.size):
+            d1 = x[i] - x01
+            d2 = x[i] - x02
+            out[i] = A1 * h12 / (d1 * d1 + h12) + A2 * h22 / (d2 * d2 + h22) + C
+        return out
+
+    @njit(cache=True, fastmath=True)
+    def _gaussian_kernel(x, A, x0, sigma, C):
+        """Gaussian function"""
+        out = np.empty(x.size)
+        inv = 1.0 / (2 * sigma * sigma)
+        for i in range(x.size):
+            d = x[i] - x0
+            out[i] = A * np.exp(-d * d * inv) + C
+        return out
+
+    @njit(cache=True, fastmath=True)
+    def _lorentzian_jac_kernel(x, A, x0, gamma, C):
+        """Analytic Jacobian of the single Lorentzian, shape (N, 4)"""
+        jac = np.empty((x.size, 4))
+        h = 0.5 * gamma
+        h2 = h * h
+        for i in range(x.size):
+            d = x[i] - x0
+            den = d * d + h2
+            den2 = den * den
+            jac[i, 0] = h2 / den
+            jac[i, 1] = A * h2 * 2 * d / den2
+            jac[i, 2] = A * h * d * d / den2
+            jac[i, 3] = 1.0
+        return jac
+
+    @njit(cache=True, fastmath=True)
+    def _double_lorentzian_jac_kernel(x, A1, x01, gamma1, A2, x02, gamma2, C):
+        """Analytic Jacobian of the double Lorentzian, shape (N, 7)"""
+        jac = np.empty((x.size, 7))
+        h1 = 0.5 * gamma1
+        h2 = 0.5 * gamma2
+        for i in range(x.size):
+            d1 = x[i] - x01
+            den1 = d1 * d1 + h1 * h1
+            d2 = x[i] - x02
+            den2 = d2 * d2 + h2 * h2
+            jac[i, 0] = h1 * h1 / den1
+            jac[i, 1] = A1 * h1 * h1 * 2 * d1 / (den1 * den1)
+            jac[i, 2] = A1 * h1 * d1 * d1 / (den1 * den1)
+            jac[i, 3] = h2 * h2 / den2
+            jac[i, 4] = A2 * h2 * h2 * 2 * d2 / (den2 * den2)
+            jac[i, 5] = A2 * h2 * d2 * d2 / (den2 * den2)
+            jac[i, 6] = 1.0
+        return jac
+
+    @njit(cache=True, fastmath=True)
+    def _gaussian_jac_kernel(x, A, x0, sigma, C):
+        """Analytic Jacobian of the Gaussian, shape (N, 4)"""
+        jac = np.empty((x.size, 4))
+        inv = 1.0 / (sigma * sigma)
+        for i in range(x.size):
+            d = x[i] - x0
+            g = np.exp(-0.5 * d * d * inv)
+            jac[i, 0] = g
+            jac[i, 1] = A * g * d * inv
+            jac[i, 2] = A * g * d * d * inv / sigma
+            jac[i, 3] = 1.0
+        return jac
+
+    # Fused kernels for the single Lorentzian on a fixed grid: the weighted
+    # residual and Jacobian are produced in one pass, without the model,
+    # difference and scaling temporaries of the generic path
+    @njit(cache=True, fastmath=True)
+    def _lorentzian_residuals(x, y, w, A, x0, gamma, C):
+        """Weighted residuals (lorentzian(x) - y) * w"""
+        out = np.empty(x.size)
+        h2 = (0.5 * gamma)**2
+        for i in range(x.size):
+            d = x[i] - x0
+            out[i] = (A * h2 / (d * d + h2) + C - y[i]) * w[i]
+        return out
+
+    @njit(cache=True, fastmath=True)
+    def _lorentzian_weighted_jac(x, w, A, x0, gamma, C):
+        """Jacobian of the weighted Lorentzian residuals, shape (N, 4)"""
+        jac = np.empty((x.size, 4))
+        h = 0.5 * gamma
+        h2 = h * h
+        for i in range(x.size):
+            d = x[i] - x0
+            den = d * d + h2
+            wd = w[i] / (den * den)
+            jac[i, 0] = w[i] * h2 / den
+            jac[i, 1] = A * h2 * 2 * d * wd
+            jac[i, 2] = A * h * d * d * wd
+            jac[i, 3] = w[i]
+        return jac
+
+    _KERNELS = {
+        lorentzian: _lorentzian_kernel,
+        double_lorentzian: _double_lorentzian_kernel,
+        gaussian: _gaussian_kernel,
+        lorentzian_jac: _lorentzian_jac_kernel,
+        double_lorentzian_jac: _double_lorentzian_jac_kernel,
+        gaussian_jac: _gaussian_jac_kernel,
+    }
+
+def _model_kernel(func):
+    """Compiled kernel for a model or Jacobian on a 1-D float64 grid, else func"""
+    if HAS_NUMBA:
+        return _KERNELS.get(func, func)
+    return func
+
+def fit_spectrum(x_data, y_data, y_errors, func, p0, bounds, maxfev=5000, jac=None,
+                 x_finite=None):
     """
     Fit a spectrum with given function
     
@@ -39,6 +217,12 @@ def fit_spectrum(x_data, y_data, y_errors, func, p0, bounds, maxfev=5000):
         Parameter bounds
     maxfev : int
         Maximum number of function evaluations
+    jac : callable, optional
+        Analytic Jacobian of func, called as jac(x, *params).
+        Falls back to finite differences when None.
+    x_finite : array of bool, optional
+        Precomputed np.isfinite(x_data), e.g. cached per data set since
+        the omega grid is shared by every spectrum
         
     Returns:
     --------
@@ -47,21 +231,193 @@ def fit_spectrum(x_data, y_data, y_errors, func, p0, bounds, maxfev=5000):
     perr : array
         Parameter errors
     """
-    # Remove NaN and infinite values
-    mask = np.isfinite(x_data) & np.isfinite(y_data) & (y_errors > 0)
-    x_fit = x_data[mask]
-    y_fit = y_data[mask]
-    errors_fit = y_errors[mask]
+    # Remove NaN and infinite values, combining the masks in place
+    mask = np.isfinite(x_data) if x_finite is None else x_finite.copy()
+    np.logical_and(mask, np.isfinite(y_data), out=mask)
+    np.logical_and(mask, y_errors > 0, out=mask)
+    # Data may be stored as float32; the optimizer works in float64, so
+    # convert once here rather than on every residual evaluation
+    x_fit = x_data[mask].astype(np.float64, copy=False)
+    y_fit = y_data[mask].astype(np.float64, copy=False)
+    errors_fit = y_errors[mask].astype(np.float64, copy=False)
     
     if len(x_fit) < 4:
         raise ValueError("Not enough valid data points for fitting")
     
-    # Perform fit
-    popt, pcov = curve_fit(func, x_fit, y_fit, 
-                          p0=p0, sigma=errors_fit, 
-                          bounds=bounds, maxfev=maxfev)
+    # Perform weighted fit; calling least_squares directly skips curve_fit's
+    # per-call argument checking and residual wrapping
+    weights = 1.0 / errors_fit
+    
+    if HAS_NUMBA and func is lorentzian and jac is lorentzian_jac:
+        def residuals(params):
+            return _lorentzian_residuals(x_fit, y_fit, weights, *params)
+        
+        def jacobian(params):
+            return _lorentzian_weighted_jac(x_fit, weights, *params)
+    else:
+        # x_fit is 1-D float64 here, as the compiled kernels require
+        func = _model_kernel(func)
+        jac = _model_kernel(jac)
+        
+        def residuals(params):
+            return (func(x_fit, *params) - y_fit) * weights
+        
+        if jac is not None:
+            def jacobian(params):
+                return jac(x_fit, *params) * weights[:, None]
+        else:
+            jacobian = '2-point'
+    
+    res = least_squares(residuals, p0, jac=jacobian, bounds=bounds,
+                        method='trf', ftol=1e-5, xtol=1e-5, max_nfev=maxfev)
+    if not res.success:
+        raise RuntimeError("Optimal parameters not found: " + res.message)
+    popt = res.x
+    
+    # Covariance from the Jacobian at the solution (Moore-Penrose inverse,
+    # as curve_fit does), scaled by the reduced chi-square
+    _, s, VT = np.linalg.svd(res.jac, full_matrices=False)
+    threshold = np.finfo(float).eps * max(res.jac.shape) * s[0]
+    keep = s > threshold
+    s = s[keep]
+    VT = VT[keep]
+    pcov = np.dot(VT.T / s**2, VT)
+    dof = len(y_fit) - len(popt)
+    if dof > 0:
+        pcov = pcov * (2 * res.cost / dof)
+    else:
+        pcov.fill(np.inf)
     
     # Calculate errors
-    perr = np.sqrt(np.diag(pcov)) if pcov is not None else np.zeros_like(popt)
+    perr = np.sqrt(np.diag(pcov))
+    
+    return popt, perr
+
+def estimate_lorentzian_p0(x_data, S_data):
+    """
+    Estimate single-Lorentzian initial parameters for every row of S_data
+    
+    Amplitude, center and background come from each row's max, argmax and
+    min; the width is the full width at half maximum, taken from the
+    nearest points either side of the peak that fall below half height.
+    
+    Parameters:
+    -----------
+    x_data : array
+        X data (omega values), shape (N,)
+    S_data : array
+        Spectra, one per row, shape (M, N)
+        
+    Returns:
+    --------
+    array
+        Initial parameters [A, x0, gamma, C] per row, shape (M, 4)
+    """
+    n = len(x_data)
+    p0 = np.zeros((len(S_data), 4))
+    p0[:, 2] = 1.0
+    if n == 0:
+        return p0
+    
+    A0 = np.max(S_data, axis=1)
+    C0 = np.min(S_data, axis=1)
+    imax = np.argmax(S_data, axis=1)
+    
+    # Last index left of the peak and first index right of it below half height
+    below = S_data < ((A0 + C0) / 2)[:, None]
+    idx = np.arange(n)
+    left = np.where(below & (idx < imax[:, None]), idx, 0).max(axis=1)
+    right = np.where(below & (idx > imax[:, None]), idx, n - 1).min(axis=1)
+    
+    p0[:, 0] = A0
+    p0[:, 1] = x_data[imax]
+    p0[:, 2] = np.abs(x_data[right] - x_data[left])
+    p0[:, 3] = C0
+    return p0
+
+# Worker-side cache of attached shared-memory arrays, keyed by segment name
+_shared_arrays = {}
+
+
+def share_array(arr):
+    """
+    Copy an array into a new shared-memory segment.
+    
+    Parameters:
+    -----------
+    arr : ndarray
+        Array to share with process-pool workers
+        
+    Returns:
+    --------
+    shm : SharedMemory
+        The segment; the caller must close() and unlink() it when done
+    spec : tuple
+        Picklable ``(name, shape, dtype)`` used by workers to attach
+    """
+    shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+    view = np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)
+    view[...] = arr
+    return shm, (shm.name, arr.shape, arr.dtype.str)
+
+
+def _attach_shared(spec):
+    """Return a no-copy view of a shared array, attaching once per process"""
+    name, shape, dtype = spec
+    if name not in _shared_arrays:
+        shm = shared_memory.SharedMemory(name=name)
+        _shared_arrays[name] = (shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf))
+    return _shared_arrays[name][1]
+
+
+def _fit_row(args):
+    """
+    Fit a single Q row with the Lorentzian model.
     
-    return popt, perr
\ No newline at end of file
+    Takes a ``(i, x_fit, y_fit, errors_fit, p0, bounds)`` tuple holding the
+    row itself and returns ``(i, popt, perr)``, with ``popt``/``perr`` None
+    on failure. Used directly for batches fitted in-process.
+    """
+    i, x_fit, y_fit, errors_fit, p0, bounds = args
+    try:
+        # fit_spectrum drops non-finite and zero-error points itself
+        popt, perr = fit_spectrum(x_fit, y_fit, errors_fit, lorentzian, p0, bounds,
+                                  jac=lorentzian_jac)
+        return i, popt, perr
+    except Exception as e:
+        print(f"Fit failed for Q index {i}: {e}")
+        return i, None, None
+
+
+def _fit_one(args):
+    """
+    Fit a single Q row from shared memory (see ``_fit_row``).
+    
+    Module-level so it can be dispatched to a process pool; takes a
+    picklable ``(i, x_fit, s_spec, e_spec, p0, bounds)`` tuple, where the
+    specs come from ``share_array``, so only the row index travels with the
+    task and the worker reads the row straight from shared memory.
+    """
+    i, x_fit, s_spec, e_spec, p0, bounds = args
+    try:
+        y_fit = _attach_shared(s_spec)[i]
+        errors_fit = _attach_shared(e_spec)[i]
+    except Exception as e:
+        print(f"Fit failed for Q index {i}: {e}")
+        return i, None, None
+    return _fit_row((i, x_fit, y_fit, errors_fit, p0, bounds))
+
+
+if HAS_NUMBA:
+    # Compile (or load from cache) now so the first user fit does not pay for it
+    _x_warmup = np.linspace(-1.0, 1.0, 4)
+    for _func, _params in ((_lorentzian_kernel, (1.0, 0.0, 1.0, 0.0)),
+                           (_lorentzian_jac_kernel, (1.0, 0.0, 1.0, 0.0)),
+                           (_lorentzian_residuals, (_x_warmup, _x_warmup, 1.0, 0.0, 1.0, 0.0)),
+                           (_lorentzian_weighted_jac, (_x_warmup, 1.0, 0.0, 1.0, 0.0)),
+                           (_gaussian_kernel, (1.0, 0.0, 1.0, 0.0)),
+                           (_gaussian_jac_kernel, (1.0, 0.0, 1.0, 0.0)),
+                           (_double_lorentzian_kernel, (1.0, 0.0, 1.0, 1.0, 0.0, 1.0, 0.0)),
+                           (_double_lorentzian_jac_kernel, (1.0, 0.0, 1.0, 1.0, 0.0, 1.0, 0.0))):
+        _func(_x_warmup, *_params)
+    del _x_warmup, _func, _params
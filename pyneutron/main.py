@@ -8,7 +8,7 @@ import traceback
 
 def check_dependencies():
     """Check if all required packages are installed"""
-    required_packages = ['numpy', 'h5py', 'matplotlib', 'scipy', 'pandas']
+    required_packages = ['numpy', 'h5py', 'matplotlib', 'scipy']
     
     missing = []
     for package in required_packages:
@@ -47,6 +47,15 @@ def main():
             input("Press Enter to exit...")
             sys.exit(1)
     
+    # Configure matplotlib before anything imports pyplot: pin the Tk
+    # backend and keep per-draw layout/path work to a minimum
+    import matplotlib
+    matplotlib.use('TkAgg')
+    matplotlib.rcParams['figure.autolayout'] = False
+    matplotlib.rcParams['path.simplify'] = True
+    matplotlib.rcParams['path.simplify_threshold'] = 1.0
+    matplotlib.rcParams['agg.path.chunksize'] = 10000
+    
     # Import and run the application
     try:
         import tkinter as tk
@@ -3,169 +3,387 @@ Plotting utilities for neutron data visualization
 """
 
 import numpy as np
-import matplotlib.pyplot as plt
+import matplotlib as mpl
+from matplotlib.cm import ScalarMappable
+
+from .data_loader import get_errors
+
+def _style_axis(ax, title, xlabel, ylabel, font_sizes, grid=True):
+    """Apply the standard title, labels, tick sizes and grid to an axis"""
+    ax.set_title(title, fontsize=font_sizes['title'])
+    ax.set_xlabel(xlabel, fontsize=font_sizes['label'])
+    ax.set_ylabel(ylabel, fontsize=font_sizes['label'])
+    ax.tick_params(axis='both', labelsize=font_sizes['tick'])
+    if grid:
+        ax.grid(True, alpha=0.3, linestyle='--')
+    else:
+        ax.grid(False)
 
 def initialize_plots(ax1, ax2, ax3, ax4, font_sizes):
     """Initialize all plots with proper formatting"""
-    # Set titles and labels with better font sizes
-    ax1.set_title("2D Color Map - S(Q,ω)", fontsize=font_sizes['title'])
-    ax1.set_xlabel("ω (meV)", fontsize=font_sizes['label'])
-    ax1.set_ylabel("Q (Å⁻¹)", fontsize=font_sizes['label'])
-    ax1.tick_params(axis='both', labelsize=font_sizes['tick'])
-    
-    ax2.set_title("Current Spectrum", fontsize=font_sizes['title'])
-    ax2.set_xlabel("ω (meV)", fontsize=font_sizes['label'])
-    ax2.set_ylabel("S(ω)", fontsize=font_sizes['label'])
-    ax2.tick_params(axis='both', labelsize=font_sizes['tick'])
-    
-    ax3.set_title("Dispersion Relation", fontsize=font_sizes['title'])
-    ax3.set_xlabel("Q (Å⁻¹)", fontsize=font_sizes['label'])
-    ax3.set_ylabel("Peak Center (meV)", fontsize=font_sizes['label'])
-    ax3.tick_params(axis='both', labelsize=font_sizes['tick'])
-    
-    ax4.set_title("Parameter Trends", fontsize=font_sizes['title'])
-    ax4.set_xlabel("Q (Å⁻¹)", fontsize=font_sizes['label'])
-    ax4.set_ylabel("Parameter Value", fontsize=font_sizes['label'])
-    ax4.tick_params(axis='both', labelsize=font_sizes['tick'])
-    
-    # Add grid for better readability
-    for ax in [ax2, ax3, ax4]:
-        ax.grid(True, alpha=0.3, linestyle='--')
+    # Axes rebuilt later by clear() take their font sizes and grid from
+    # rcParams, so updates only need to set the label text
+    mpl.rcParams.update({
+        'axes.titlesize': font_sizes['title'],
+        'axes.labelsize': font_sizes['label'],
+        'xtick.labelsize': font_sizes['tick'],
+        'ytick.labelsize': font_sizes['tick'],
+        'axes.grid': True,
+        'grid.alpha': 0.3,
+        'grid.linestyle': '--',
+    })
+    
+    # The axes already exist, so style them explicitly once
+    _style_axis(ax1, "2D Color Map - S(Q,ω)", "ω (meV)", "Q (Å⁻¹)", font_sizes, grid=False)
+    _style_axis(ax2, "Current Spectrum", "ω (meV)", "S(ω)", font_sizes)
+    _style_axis(ax3, "Dispersion Relation", "Q (Å⁻¹)", "Peak Center (meV)", font_sizes)
+    _style_axis(ax4, "Parameter Trends", "Q (Å⁻¹)", "Parameter Value", font_sizes)
+    _create_persistent_artists(ax1.figure, ax1, ax2, font_sizes)
 
-def update_plots(ax1, ax2, ax3, ax4, data, current_q_index, fit_results, font_sizes, canvas, fig):
-    """Update all plots with current data"""
-    # Clear plots
-    for ax in [ax1, ax2, ax3, ax4]:
-        ax.clear()
-    
-    # Plot 1: 2D color map
-    if len(data['q']) > 1 and len(data['omega']) > 1:
-        im = ax1.imshow(data['S_data'], 
-                       aspect='auto',
-                       origin='lower',
-                       extent=[data['omega'][0], data['omega'][-1], 
-                              data['q'][0], data['q'][-1]],
-                       cmap='viridis',
-                       interpolation='nearest')
-        ax1.set_title("2D Color Map - S(Q,ω)", fontsize=font_sizes['title'])
-        ax1.set_xlabel("ω (meV)", fontsize=font_sizes['label'])
-        ax1.set_ylabel("Q (Å⁻¹)", fontsize=font_sizes['label'])
-        ax1.tick_params(axis='both', labelsize=font_sizes['tick'])
-        
-        # Add colorbar
-        cbar = plt.colorbar(im, ax=ax1)
-        cbar.ax.tick_params(labelsize=font_sizes['tick'])
-        
-        # Highlight current Q
-        if current_q_index < len(data['q']):
-            current_q = data['q'][current_q_index]
-            ax1.axhline(y=current_q, color='red', linestyle='--', linewidth=1, alpha=0.7)
+def _create_persistent_artists(fig, ax1, ax2, font_sizes):
+    """Create the artists that update_plots updates in place on later calls"""
+    # Placeholder image, hidden until update_plots uploads S_data. The map is
+    # colored once per dataset into uint8 RGBA (fig._pn_rgba), so draws skip
+    # the colormap step; the norm and colormap live on a standalone mappable
+    fig._pn_im = ax1.imshow(np.zeros((1, 1, 4), dtype=np.uint8),
+                            aspect='auto',
+                            origin='lower',
+                            interpolation='nearest',
+                            visible=False)
+    fig._pn_data_source = None
+    fig._pn_static_table = None
+    fig._pn_rgba = None
+    fig._pn_map_data = None
+    fig._pn_map_step = None
+    fig._pn_mappable = ScalarMappable(cmap='viridis')
+    
+    # Add the colorbar once; it follows the mappable via update_normal
+    fig._pn_cbar = fig.colorbar(fig._pn_mappable, ax=ax1)
+    fig._pn_cbar.ax.tick_params(labelsize=font_sizes['tick'])
+    
+    fig._pn_hline = ax1.axhline(y=0, color='red', linestyle='--', linewidth=1, alpha=0.7,
+                                visible=False)
+    fig._pn_no_map_text = ax1.text(0.5, 0.5, "Insufficient data\nfor 2D plot", 
+                                   ha='center', va='center', transform=ax1.transAxes,
+                                   fontsize=font_sizes['title'], visible=False)
+    
+    # Spectrum markers; the connecting line is switched on when there are no errors
+    fig._pn_spectrum, = ax2.plot([], [], 'o', markersize=4, alpha=0.7, linewidth=1)
+    # Errors as one shaded band rather than an errorbar's per-point segments
+    fig._pn_err_band = ax2.fill_between([], [], [], color=fig._pn_spectrum.get_color(),
+                                        alpha=0.3, linewidth=0)
+    
+    # Fit overlay, hidden until show_spectrum_fit is called
+    fig._pn_fit_line, = ax2.plot([], [], 'r-', linewidth=2, visible=False)
+    fig._pn_fit_text = ax2.text(0.02, 0.98, '', transform=ax2.transAxes,
+                                verticalalignment='top', fontsize=font_sizes['info'],
+                                bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.8),
+                                visible=False)
+    fig._pn_title = ax2.title
+    fig._pn_legend = None
+    fig._pn_font_sizes = font_sizes
+    
+    # Everything that depends on the current Q is animated: it is left out
+    # of the cached background and redrawn on its own by blitting
+    for artist in [fig._pn_hline, fig._pn_err_band, fig._pn_spectrum, fig._pn_title,
+                   fig._pn_fit_line, fig._pn_fit_text]:
+        artist.set_animated(True)
+    fig._pn_animated = []
+    fig._pn_bg = None
+    
+    # Blit background capture after each full draw, relayout on resize
+    fig._pn_draw_cid = fig.canvas.mpl_connect('draw_event', _on_draw)
+    fig._pn_resize_cid = fig.canvas.mpl_connect('resize_event', _on_resize)
+
+def update_plots(ax1, ax2, ax3, ax4, data, current_q_index, fit_table, font_sizes, canvas, fig):
+    """
+    Update all plots with current data; fit_table is a FitTable or None
+    
+    If the data and fit results are the ones already drawn this is just
+    update_plots_hot; otherwise update_plots_cold runs first and the whole
+    figure is redrawn once.
+    """
+    # Nothing static changed since the cached background was drawn: only the
+    # current-Q artists can differ, so blit them instead of a full redraw
+    if (getattr(fig, '_pn_bg', None) is not None
+            and fig._pn_data_source is data['S_data']
+            and fig._pn_static_table is fit_table
+            and update_plots_hot(fig, canvas, data, current_q_index)):
+        return
+    
+    update_plots_cold(ax1, ax2, ax3, ax4, data, fit_table, font_sizes, canvas, fig)
+    
+    # Current-Q artists; any fit overlay belonged to the previous state
+    has_spectrum = current_q_index < len(data['q'])
+    fig._pn_fit_line.set_visible(False)
+    fig._pn_fit_text.set_visible(False)
+    if has_spectrum:
+        _set_current_q(fig, data, current_q_index)
     else:
-        ax1.text(0.5, 0.5, "Insufficient data\nfor 2D plot", 
-                 ha='center', va='center', transform=ax1.transAxes,
-                 fontsize=font_sizes['title'])
-    
-    # Plot 2: Current spectrum
-    if current_q_index < len(data['q']):
-        q_val = data['q'][current_q_index]
-        x_data = data['omega']
-        y_data = data['S_data'][current_q_index, :]
+        _set_spectrum_style(fig, False)
+        fig._pn_title.set_text("Current Spectrum")
+    fig._pn_spectrum.set_visible(has_spectrum)
+    fig._pn_hline.set_visible(has_spectrum and fig._pn_im.get_visible())
+    
+    # The legend handle copies the line style, so it is rebuilt here
+    legend = None
+    if has_spectrum:
+        legend = ax2.legend([fig._pn_spectrum], [fig._pn_spectrum.get_label()],
+                            fontsize=font_sizes['legend'])
+        legend.set_animated(True)
+    elif fig._pn_legend is not None:
+        fig._pn_legend.remove()
+    fig._pn_legend = legend
+    
+    animated = [fig._pn_hline, fig._pn_err_band, fig._pn_spectrum, fig._pn_title,
+                fig._pn_fit_line, fig._pn_fit_text]
+    if legend is not None:
+        animated.append(legend)
+    fig._pn_animated = animated
+    fig._pn_bg = None
+    
+    # Layout only changes with the canvas size (see _on_resize), not per update
+    canvas.draw_idle()
+
+def update_plots_cold(ax1, ax2, ax3, ax4, data, fit_table, font_sizes, canvas, fig):
+    """
+    Update everything that does not depend on the current Q
+    
+    The 2D map, its colorbar and the spectrum axis ranges are only
+    recomputed when S_data itself changes; the fit result plots are
+    redrawn from fit_table. Nothing is drawn here, see update_plots.
+    """
+    S = data['S_data']
+    has_map = len(data['q']) > 1 and len(data['omega']) > 1
+    if fig._pn_data_source is not S:
+        finite = S[np.isfinite(S)]
         
-        # Check if errors are available
-        if 'S_errors' in data and data['S_errors'].shape == data['S_data'].shape:
-            y_errors = data['S_errors'][current_q_index, :]
-            ax2.errorbar(x_data, y_data, yerr=y_errors,
-                        fmt='o', markersize=4, alpha=0.7, 
-                        label=f'Q = {q_val:.3f} Å⁻¹',
-                        capsize=2, elinewidth=1)
-        else:
-            ax2.plot(x_data, y_data,
-                    'o-', markersize=4, alpha=0.7, 
-                    label=f'Q = {q_val:.3f} Å⁻¹', linewidth=1)
+        # Plot 1: 2D color map
+        if has_map:
+            extent = [data['omega'][0], data['omega'][-1], data['q'][0], data['q'][-1]]
+            if finite.size > 0:
+                fig._pn_mappable.set_clim(finite.min(), finite.max())
+            fig._pn_map_data = S
+            fig._pn_map_step = None
+            _upload_map(fig)
+            fig._pn_im.set_extent(extent)
+            fig._pn_cbar.update_normal(fig._pn_mappable)
+            ax1.set_xlim(extent[0], extent[1])
+            ax1.set_ylim(extent[2], extent[3])
+        elif fig._pn_map_data is not None:
+            # The image artist is only hidden; drop the previous map's buffers
+            # so they are neither kept alive nor recolored on resize
+            fig._pn_map_data = None
+            fig._pn_map_step = None
+            fig._pn_rgba = None
+            fig._pn_im.set_data(np.zeros((1, 1, 4), dtype=np.uint8))
         
-        ax2.set_title(f"Spectrum at Q = {q_val:.3f} Å⁻¹", fontsize=font_sizes['title'])
-        ax2.set_xlabel("ω (meV)", fontsize=font_sizes['label'])
-        ax2.set_ylabel("S(ω)", fontsize=font_sizes['label'])
-        ax2.tick_params(axis='both', labelsize=font_sizes['tick'])
-        ax2.legend(fontsize=font_sizes['legend'])
-        ax2.grid(True, alpha=0.3, linestyle='--')
+        # Plot 2: fix the ranges over all Q so blitted spectra stay in view
+        if finite.size > 0:
+            y_min, y_max = finite.min(), finite.max()
+            pad = 0.05 * (y_max - y_min) if y_max > y_min else 1.0
+            ax2.set_ylim(y_min - pad, y_max + pad)
+        omega = np.asarray(data['omega'])
+        omega = omega[np.isfinite(omega)]
+        if omega.size > 0:
+            x_min, x_max = omega.min(), omega.max()
+            pad = 0.05 * (x_max - x_min) if x_max > x_min else 1.0
+            ax2.set_xlim(x_min - pad, x_max + pad)
+        fig._pn_data_source = S
+    fig._pn_im.set_visible(has_map)
+    fig._pn_no_map_text.set_visible(not has_map)
     
     # Plot 3 & 4: Only if we have fit results
-    if len(fit_results) > 0:
-        plot_fit_results(ax3, ax4, data, fit_results, font_sizes, canvas)
+    if fit_table is not None:
+        plot_fit_results(ax3, ax4, data, fit_table, font_sizes, canvas)
     else:
         # Clear fit result plots
-        ax3.set_title("Dispersion Relation", fontsize=font_sizes['title'])
-        ax3.set_xlabel("Q (Å⁻¹)", fontsize=font_sizes['label'])
-        ax3.set_ylabel("Peak Center (meV)", fontsize=font_sizes['label'])
-        ax3.tick_params(axis='both', labelsize=font_sizes['tick'])
-        ax3.grid(True, alpha=0.3, linestyle='--')
-        
-        ax4.set_title("Parameter Trends", fontsize=font_sizes['title'])
-        ax4.set_xlabel("Q (Å⁻¹)", fontsize=font_sizes['label'])
-        ax4.set_ylabel("Parameter Value", fontsize=font_sizes['label'])
-        ax4.tick_params(axis='both', labelsize=font_sizes['tick'])
-        ax4.grid(True, alpha=0.3, linestyle='--')
+        ax3.clear()
+        ax3.set(title="Dispersion Relation", xlabel="Q (Å⁻¹)", ylabel="Peak Center (meV)")
+        ax4.clear()
+        ax4.set(title="Parameter Trends", xlabel="Q (Å⁻¹)", ylabel="Parameter Value")
+    fig._pn_static_table = fit_table
+
+def update_plots_hot(fig, canvas, data, current_q_index):
+    """
+    Redraw only the current-Q artists (spectrum, Q cursor) by blitting
     
-    # Adjust layout
+    Returns False if there is no cached background to blit onto, in which
+    case the caller should fall back to a full update_plots.
+    """
+    if getattr(fig, '_pn_bg', None) is None or fig._pn_legend is None:
+        return False
+    if current_q_index >= len(data['q']):
+        return False
+    
+    # A fit overlay belongs to the previous Q; hide it
+    show_fit = fig._pn_fit_line.get_visible()
+    fig._pn_fit_line.set_visible(False)
+    fig._pn_fit_text.set_visible(False)
+    
+    if _set_current_q(fig, data, current_q_index) or show_fit:
+        _set_spectrum_legend(fig, show_fit=False)
+    else:
+        fig._pn_legend.get_texts()[0].set_text(fig._pn_spectrum.get_label())
+    
+    _blit(fig, canvas)
+    return True
+
+def _set_current_q(fig, data, index):
+    """
+    Point the spectrum, error band, title and Q cursor at one Q index
+    
+    Returns True if the spectrum style changed (the legend handle is then stale).
+    """
+    q_val = data['q'][index]
+    y_errors = _spectrum_errors(data, index)
+    restyled = _set_spectrum_style(fig, y_errors is not None)
+    _set_spectrum_data(fig, data['omega'], data['S_data'][index, :], y_errors)
+    fig._pn_spectrum.set_label(f'Q = {q_val:.3f} Å⁻¹')
+    fig._pn_title.set_text(f"Spectrum at Q = {q_val:.3f} Å⁻¹")
+    fig._pn_hline.set_ydata([q_val, q_val])
+    return restyled
+
+def _on_draw(event):
+    """Cache the static background after a full draw and paint the animated artists on it"""
+    fig = event.canvas.figure
+    if not getattr(fig, '_pn_animated', None):
+        fig._pn_bg = None
+        return
+    fig._pn_bg = event.canvas.copy_from_bbox(fig.bbox)
+    for artist in fig._pn_animated:
+        fig.draw_artist(artist)
+
+def _on_resize(event):
+    """Re-fit the layout to the new canvas size and drop the stale blit background"""
+    fig = event.canvas.figure
     fig.tight_layout()
-    canvas.draw()
+    fig._pn_bg = None
+    if fig._pn_map_data is not None:
+        _upload_map(fig)
 
-def plot_fit_results(ax3, ax4, data, fit_results, font_sizes, canvas):
-    """Plot fit results (dispersion and parameter trends)"""
-    if len(fit_results) == 0:
+def _upload_map(fig):
+    """
+    Color the 2D map into the cached RGBA image at display resolution
+    
+    Maps much larger than the axes are shown with every n-th row/column, so
+    the image is at most about twice the axes' pixel size; nearest-neighbour
+    display would drop the rest anyway. Only recolors when the step changes.
+    """
+    S = fig._pn_map_data
+    bbox = fig._pn_im.axes.get_window_extent()
+    step = (max(1, S.shape[0] // max(1, int(2 * bbox.height))),
+            max(1, S.shape[1] // max(1, int(2 * bbox.width))))
+    if step == fig._pn_map_step:
         return
+    fig._pn_map_step = step
+    fig._pn_rgba = fig._pn_mappable.to_rgba(S[::step[0], ::step[1]], bytes=True)
+    fig._pn_im.set_data(fig._pn_rgba)
+
+def _spectrum_errors(data, index):
+    """Errors for one spectrum, or None if there are none worth drawing (absent or all zero)"""
+    y_errors = get_errors(data, index)
+    if y_errors is None or not np.any(y_errors > 0):
+        return None
+    return y_errors
+
+def _set_spectrum_style(fig, has_errors):
+    """
+    Show markers with an error band, or markers joined by a line without
     
-    # Extract valid results
-    valid_indices = []
-    centers = []
-    center_errors = []
-    amplitudes = []
-    amplitude_errors = []
-    widths = []
-    width_errors = []
-    
-    for i, result in enumerate(fit_results):
-        if result is not None and len(result[0]) >= 3:
-            valid_indices.append(i)
-            popt, perr = result
-            centers.append(popt[1])  # Center parameter
-            center_errors.append(perr[1] if len(perr) > 1 else 0)
-            amplitudes.append(popt[0])  # Amplitude parameter
-            amplitude_errors.append(perr[0] if len(perr) > 0 else 0)
-            if len(popt) > 2:
-                widths.append(popt[2])  # Width parameter
-                width_errors.append(perr[2] if len(perr) > 2 else 0)
-    
-    if not valid_indices:
+    Returns True if the style changed (the legend handle is then stale).
+    """
+    if fig._pn_err_band.get_visible() == has_errors:
+        return False
+    fig._pn_err_band.set_visible(has_errors)
+    fig._pn_spectrum.set_linestyle('None' if has_errors else '-')
+    return True
+
+def _set_spectrum_data(fig, x_data, y_data, y_errors):
+    """Update the spectrum line and its error band in place"""
+    fig._pn_spectrum.set_data(x_data, y_data)
+    if y_errors is not None:
+        # Closed polygon: lower edge left to right, upper edge back
+        low = np.column_stack([x_data, y_data - y_errors])
+        high = np.column_stack([x_data, y_data + y_errors])[::-1]
+        fig._pn_err_band.set_verts([np.concatenate([low, high])])
+
+def _blit(fig, canvas):
+    """Repaint the animated artists over the cached background"""
+    if fig._pn_bg is None:
+        # No background yet; the draw_event hook paints them after the next draw
+        canvas.draw_idle()
         return
+    canvas.restore_region(fig._pn_bg)
+    for artist in fig._pn_animated:
+        fig.draw_artist(artist)
+    canvas.blit(fig.bbox)
+
+def _set_spectrum_legend(fig, show_fit):
+    """Rebuild the spectrum legend with or without the fit entry"""
+    old = fig._pn_legend
+    handles = [fig._pn_spectrum]
+    labels = [fig._pn_spectrum.get_label()]
+    if show_fit:
+        handles.append(fig._pn_fit_line)
+        labels.append(fig._pn_fit_line.get_label())
+    legend = old.axes.legend(handles, labels, fontsize=fig._pn_font_sizes['legend'])
+    legend.set_animated(True)
+    fig._pn_animated[fig._pn_animated.index(old)] = legend
+    fig._pn_legend = legend
+
+def show_spectrum_fit(fig, canvas, x_fit, y_fit, label, title, param_text):
+    """
+    Overlay a fitted curve and its parameter box on the current spectrum
     
-    # Plot dispersion relation
-    ax3.clear()
-    if len(valid_indices) > 0:
-        ax3.errorbar(data['q'][valid_indices], centers, yerr=center_errors,
-                    fmt='o-', linewidth=2, markersize=4, capsize=3)
-        ax3.set_title("Dispersion Relation", fontsize=font_sizes['title'])
-        ax3.set_xlabel("Q (Å⁻¹)", fontsize=font_sizes['label'])
-        ax3.set_ylabel("Peak Center (meV)", fontsize=font_sizes['label'])
-        ax3.tick_params(axis='both', labelsize=font_sizes['tick'])
-        ax3.grid(True, alpha=0.3, linestyle='--')
+    The overlay artists are persistent and blitted; returns False if no
+    spectrum has been plotted yet (call update_plots first).
+    """
+    if getattr(fig, '_pn_legend', None) is None:
+        return False
+    
+    fig._pn_fit_line.set_data(x_fit, y_fit)
+    fig._pn_fit_line.set_label(label)
+    fig._pn_fit_line.set_visible(True)
+    fig._pn_fit_text.set_text(param_text)
+    fig._pn_fit_text.set_visible(True)
+    fig._pn_title.set_text(title)
+    _set_spectrum_legend(fig, show_fit=True)
     
-    # Plot parameter trends
+    _blit(fig, canvas)
+    return True
+
+def _nonzero_yerr(errors):
+    """Errors for errorbar, or None if none are nonzero so no bars are built"""
+    return errors if np.any(errors > 0) else None
+
+def plot_fit_results(ax3, ax4, data, table, font_sizes, canvas):
+    """Plot fit results (dispersion and parameter trends) from a FitTable"""
+    # Start from blank panels, so a table with no valid rows clears the
+    # curves of earlier results
+    ax3.clear()
+    ax3.set(title="Dispersion Relation", xlabel="Q (Å⁻¹)", ylabel="Peak Center (meV)")
     ax4.clear()
-    if len(valid_indices) > 0:
-        ax4.errorbar(data['q'][valid_indices], amplitudes, yerr=amplitude_errors,
-                    fmt='o-', linewidth=2, markersize=4, capsize=3, label='Amplitude')
+    ax4.set(title="Parameter Trends", xlabel="Q (Å⁻¹)", ylabel="Parameter Value")
+    
+    # Amplitude, center and width are the first three parameters of every model
+    valid = np.flatnonzero(table.valid)
+    if table.popt.shape[1] >= 3 and valid.size > 0:
+        q = np.asarray(data['q'])[valid]
+        amplitudes, centers, widths = table.popt[valid, :3].T
+        amplitude_errors, center_errors, width_errors = table.perr[valid, :3].T
         
-        if widths:
-            ax4.errorbar(data['q'][valid_indices], widths, yerr=width_errors,
-                        fmt='s-', linewidth=2, markersize=4, capsize=3, label='Width')
+        # Plot dispersion relation
+        ax3.errorbar(q, centers, yerr=_nonzero_yerr(center_errors),
+                    fmt='o-', linewidth=2, markersize=4, capsize=3)
         
-        ax4.set_title("Parameter Trends", fontsize=font_sizes['title'])
-        ax4.set_xlabel("Q (Å⁻¹)", fontsize=font_sizes['label'])
-        ax4.set_ylabel("Parameter Value", fontsize=font_sizes['label'])
-        ax4.tick_params(axis='both', labelsize=font_sizes['tick'])
+        # Plot parameter trends
+        ax4.errorbar(q, amplitudes, yerr=_nonzero_yerr(amplitude_errors),
+                    fmt='o-', linewidth=2, markersize=4, capsize=3, label='Amplitude')
+        ax4.errorbar(q, widths, yerr=_nonzero_yerr(width_errors),
+                    fmt='s-', linewidth=2, markersize=4, capsize=3, label='Width')
         ax4.legend(fontsize=font_sizes['legend'])
-        ax4.grid(True, alpha=0.3, linestyle='--')
     
-    canvas.draw()
\ No newline at end of file
+    # Deferred, so the redraw requested by update_plots right after this
+    # coalesces with it into a single render
+    canvas.draw_idle()
\ No newline at end of file
@@ -2,10 +2,57 @@
 Utility functions for PyNeutron
 """
 
-import pandas as pd
 import numpy as np
 
-def export_results(filename, data, fit_results):
+class FitTable:
+    """
+    Fit results as a structure of arrays
+    
+    Attributes:
+    -----------
+    popt : ndarray
+        Fitted parameters, shape (N_q, n_params); NaN where there is no fit
+    perr : ndarray
+        Parameter errors, same shape as popt
+    valid : ndarray of bool
+        True for Q indices with a fit result, shape (N_q,)
+    """
+    def __init__(self, popt, perr, valid):
+        self.popt = popt
+        self.perr = perr
+        self.valid = valid
+
+def fit_results_to_table(fit_results, n_params=None):
+    """
+    Convert a list of (popt, perr) fit results into a FitTable
+    
+    Parameters:
+    -----------
+    fit_results : list
+        List of fit results, None where a Q index has no fit
+    n_params : int, optional
+        Number of parameter columns; defaults to the length of the first
+        valid result. Longer results are truncated, shorter ones NaN-padded.
+        
+    Returns:
+    --------
+    FitTable
+        Parameters and errors for every Q index
+    """
+    valid = np.array([result is not None for result in fit_results], dtype=bool)
+    if n_params is None:
+        n_params = len(fit_results[np.argmax(valid)][0]) if valid.any() else 0
+    
+    popt = np.full((len(fit_results), n_params), np.nan)
+    perr = np.full((len(fit_results), n_params), np.nan)
+    for i in np.flatnonzero(valid):
+        p, e = fit_results[i]
+        popt[i, :min(len(p), n_params)] = p[:n_params]
+        perr[i, :min(len(e), n_params)] = e[:n_params]
+    
+    return FitTable(popt, perr, valid)
+
+def export_results(filename, data, table):
     """
     Export fit results to CSV file
     
@@ -15,26 +62,17 @@ def export_results(filename, data, fit_results):
         Output filename
     data : dict
         Data dictionary
-    fit_results : list
-        List of fit results
+    table : FitTable
+        Fit results, see fit_results_to_table
     """
-    # Prepare data for export
-    q_values = []
-    fit_params = []
-    fit_errors = []
-    
-    for i, result in enumerate(fit_results):
-        if result is not None:
-            q_values.append(data['q'][i])
-            popt, perr = result
-            fit_params.append(popt)
-            fit_errors.append(perr)
-    
-    if not q_values:
+    valid = np.flatnonzero(table.valid)
+    
+    if valid.size == 0:
         raise ValueError("No valid fit results to export")
     
-    # Create DataFrame
-    num_params = len(fit_params[0])
+    num_params = table.popt.shape[1]
+    
+    # Column header
     columns = ['Q']
     
     # Add parameter names
@@ -44,13 +82,14 @@ def export_results(filename, data, fit_results):
         columns.append(name)
         columns.append(f'{name}_error')
     
-    data_rows = []
-    for q, params, errors in zip(q_values, fit_params, fit_errors):
-        row = [q]
-        for i in range(num_params):
-            row.append(params[i] if i < len(params) else np.nan)
-            row.append(errors[i] if i < len(errors) else np.nan)
-        data_rows.append(row)
+    # Interleave value/error columns after Q
+    out = np.empty((valid.size, 1 + 2 * num_params))
+    out[:, 0] = np.asarray(data['q'])[valid]
+    out[:, 1::2] = table.popt[valid]
+    out[:, 2::2] = table.perr[valid]
     
-    df = pd.DataFrame(data_rows, columns=columns)
-    df.to_csv(filename, index=False, float_format='%.6f')
\ No newline at end of file
+    # savetxt writes one line at a time; a large buffer turns that into a
+    # few big writes. Missing parameters are written as nan
+    with open(filename, 'wb', buffering=4*1024*1024) as f:
+        np.savetxt(f, out, fmt='%.6f', delimiter=',',
+                   header=','.join(columns), comments='')